@@ -0,0 +1,53 @@
+"""
+ウォールブレイカーの外部制御・観戦用クライアント（動作確認用）
+使い方:
+    python wall_breaker.py --control-socket /tmp/wall_breaker.sock
+    python control_client.py /tmp/wall_breaker.sock          # 観戦
+    python control_client.py /tmp/wall_breaker.sock --bot    # ボールを追いかけるボット
+"""
+import argparse
+import asyncio
+import struct
+
+from wall_breaker import MSG_HEADER, MSG_INPUT, MSG_STATE, decode_state
+
+
+async def run(path, bot):
+    reader, writer = await asyncio.open_unix_connection(path)
+    direction = 0
+    try:
+        while True:
+            kind, length = MSG_HEADER.unpack(await reader.readexactly(MSG_HEADER.size))
+            body = await reader.readexactly(length)
+            if kind != MSG_STATE:
+                continue
+            state = decode_state(body)
+            print(f"frame={state['frame']} score={state['score']} life={state['life']} "
+                  f"balls={len(state['balls'])} blocks={len(state['blocks'])}")
+
+            if bot and state["balls"]:
+                # 一番下にあるボールの真下にラケットを動かす
+                ball_x = max(state["balls"], key=lambda ball: ball[1])[0]
+                paddle_x, _, paddle_w = state["paddle"]
+                center = paddle_x + paddle_w // 2
+                new_direction = 0
+                if ball_x < center - 10:
+                    new_direction = -1
+                elif ball_x > center + 10:
+                    new_direction = 1
+                if new_direction != direction:
+                    direction = new_direction
+                    writer.write(MSG_HEADER.pack(MSG_INPUT, 1) + struct.pack("b", direction))
+                    await writer.drain()
+    except asyncio.IncompleteReadError:
+        print("サーバとの接続が切れました")
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ウォールブレイカーの外部制御・観戦用クライアント")
+    parser.add_argument("path", help="Unixソケットのパス")
+    parser.add_argument("--bot", action="store_true", help="ボールを追いかけてラケットを操作する")
+    args = parser.parse_args()
+    asyncio.run(run(args.path, args.bot))
@@ -1,21 +1,36 @@
+import time
+STARTUP_T0 = time.perf_counter()  # 起動時間計測の基準（pygameの読み込み前）
 import pygame as pg
 import sys
 import os
 import random
-import time
+import socket
 import math  # 標準のmathモジュールを追加
-
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+import argparse
+import asyncio
+import collections
+import contextlib
+import queue
+import stat
+import struct
+import threading
+import tracemalloc
+from typing import NamedTuple
+
+# 画像・音声ファイルはこのファイルからの相対パスで探す（カレントディレクトリは変更しない）
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # --- 定数設定 ---
-SCREEN_WIDTH = 800  # 画面の横幅
-SCREEN_HEIGHT = 600 # 画面の縦幅
+SCREEN_WIDTH = 800  # 画面の横幅（論理座標。実際のウィンドウの大きさには依存しない）
+SCREEN_HEIGHT = 600 # 画面の縦幅（論理座標）
 PADDLE_WIDTH = 100 # ラケットの横幅
 PADDLE_HEIGHT = 20 # ラケットの縦幅
 BALL_RADIUS = 10   # ボールの半径
 BLOCK_WIDTH = 69   # ブロックの横幅
 BLOCK_HEIGHT = 30  # ブロックの縦幅
 FPS = 60           # フレームレート
+BOARD_COLS = 10    # 盤面の列数（初期値）
+BOARD_ROWS = 4     # 盤面の初期行数（初期値）
 
 # 色定義
 BLACK = (0, 0, 0)
@@ -30,13 +45,141 @@ PINK = (255, 192, 203) # ラケット巨大化
 ORANGE = (255, 165, 0) # 残機増加
 CYAN = (0, 255, 255)   # ボール増加
 
+# ワールド（盤面全体）の大きさ。set_board_size() で列数・行数に合わせて更新する
+WORLD_WIDTH = SCREEN_WIDTH
+WORLD_HEIGHT = SCREEN_HEIGHT
+
 # ゲームオーバーラインのY座標（ラケットの少し上）
-GAME_OVER_LINE = SCREEN_HEIGHT - 150
+GAME_OVER_LINE = WORLD_HEIGHT - 150
+
+# 内部解像度の設定（論理画面に対する倍率。0.5なら400x300で描画して拡大する）
+RENDER_SCALE = 1.0
+RENDER_SCALE_MIN = 0.1
+RENDER_SCALE_MAX = 4.0
+SCALE_MODES = ("nearest", "smooth")  # 画面への拡大縮小方法（整数倍ニアレスト / スムーズ）
+
+# 外部制御・観戦用サーバの設定
+CONTROL_RATE = 30                # 状態を配信する頻度（回/秒）
+CONTROL_BUFFER_LIMIT = 64 * 1024 # 送信待ちがこれを超えたクライアントには配信を間引く（バイト）
+
+# カメラのズーム設定
+ZOOM_MIN = 0.25
+ZOOM_MAX = 1.0
+ZOOM_STEP = 0.25
+CAMERA_MARGIN = 20  # ラケット・ボールと画面の端との余白（論理座標）
 
 # パーティクルの設定
 PARTICLE_LIFETIME = 30  # パーティクルの寿命（フレーム数）
 PARTICLE_SPEED = 5     # パーティクルの初期速度
 
+AUDIO_SHUTDOWN_TIMEOUT = 3.0  # 終了時に音声のロードの完了を待つ最大時間（秒）
+
+# --- 起動時間の計測 ---
+class StartupProfiler:
+    """
+    起動の各段階にかかった時間を記録し、最初のフレームが表示されたときに報告するクラス
+    --startup-profile を付けたときだけ有効になる
+    """
+    def __init__(self):
+        self.enabled = False
+        # (段階名, かかった時間, 起動からの経過時間, 種類)
+        # 種類: "main"=メインスレッドの段階（markで区切る）, "sub"=その中の内訳,
+        #       "background"=別スレッドで並行して行う段階
+        self.stages = []
+        self.last_mark = STARTUP_T0
+        self.reported = False
+        self.lock = threading.Lock()
+
+    def record(self, name, start, kind="main"):
+        """ startから今までを1つの段階として記録する（別スレッドからも呼べる） """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        stage = (name, now - start, now - STARTUP_T0, kind)
+        with self.lock:
+            self.stages.append(stage)
+            reported = self.reported
+        if reported:
+            # 報告の後に終わった段階（バックグラウンドの音声など）はその場で表示する
+            self._print_stage(stage)
+
+    def mark(self, name):
+        """ 前回のmarkから今までをメインスレッドの1段階として記録する """
+        start = self.last_mark
+        self.last_mark = time.perf_counter()
+        self.record(name, start)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """ mark の区間の中で行われる処理（フォントの読み込みなど）を内訳として記録する """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, "sub")
+
+    def frame_presented(self):
+        """ Display.present() から毎フレーム呼ぶ。最初のフレームで報告する """
+        if self.reported or not self.enabled:
+            return
+        self.mark("first frame")
+        with self.lock:
+            self.reported = True
+            stages = list(self.stages)
+        print("--- startup profile (ms) ---")
+        # 内訳は、それを含むメインの段階の下に字下げして表示する（合計には含めない）
+        subs = []
+        for stage in stages:
+            if stage[3] == "sub":
+                subs.append(stage)
+                continue
+            self._print_stage(stage)
+            if stage[3] == "main":
+                for sub in subs:
+                    self._print_stage(sub)
+                subs = []
+        print(f"time to first frame: {(self.last_mark - STARTUP_T0) * 1000:.1f} ms"
+              " (sum of non-indented stages)")
+
+    def _print_stage(self, stage):
+        name, duration, elapsed, kind = stage
+        if kind == "sub":
+            name = "  - " + name
+        elif kind == "background":
+            name = name + " [bg]"
+        print(f"{name:<28}{duration * 1000:>9.1f}  (@{elapsed * 1000:.1f})")
+
+
+startup_profiler = StartupProfiler()
+
+
+def asset_path(name):
+    return os.path.join(BASE_DIR, name)
+
+
+# --- 画像・フォント（初めて使うときに読み込む） ---
+_image_cache = {}
+_font_cache = {}
+
+def load_image(name, size):
+    """ 画像を読み込んでsizeに拡大縮小する（2回目以降はキャッシュを返す） """
+    key = (name, size)
+    if key not in _image_cache:
+        with startup_profiler.stage(f"image {name}"):
+            image = pg.image.load(asset_path(name))
+            _image_cache[key] = pg.transform.scale(image, size)
+    return _image_cache[key]
+
+def get_font(size):
+    """ 指定サイズのフォントを返す（fontモジュールの初期化も初回だけ行う） """
+    if size not in _font_cache:
+        with startup_profiler.stage(f"font {size}"):
+            if not pg.font.get_init():
+                pg.font.init()
+            _font_cache[size] = pg.font.Font(None, size)
+    return _font_cache[size]
+
+
 # --- サウンド設定 ---
 def load_sounds():
     """効果音をロード"""
@@ -44,12 +187,12 @@ def load_sounds():
     sounds = {}
     try:
         # ブロック破壊音
-        break_sound = pg.mixer.Sound("sound/break.mp3")
+        break_sound = pg.mixer.Sound(asset_path("sound/break.mp3"))
         break_sound.set_volume(0.4)  # 音量を40%に設定
         sounds["break"] = break_sound
         
         # ゲームオーバー音
-        defeat_sound = pg.mixer.Sound("sound/defeat.mp3")
+        defeat_sound = pg.mixer.Sound(asset_path("sound/defeat.mp3"))
         defeat_sound.set_volume(0.5)  # 音量を50%に設定
         sounds["defeat"] = defeat_sound
         
@@ -57,11 +200,52 @@ def load_sounds():
         print(f"効果音ファイルの読み込みに失敗しました: {e}")
     
     return sounds
+
+def load_sounds_in_background(sounds, stop_event):
+    """
+    mixerの初期化と効果音のロードを別スレッドで行い、終わったらsoundsに追加する
+    ロードが終わるまでは効果音なしでゲームが進む
+    stop_event がセットされていたら（終了処理が始まっていたら）mixerには触らない
+    戻り値: ロード中のスレッド（終了前にjoinする）
+    """
+    def worker():
+        if stop_event.is_set():
+            return
+        start = time.perf_counter()
+        try:
+            sounds.update(load_sounds())
+        except pg.error as e:  # 音声デバイスが無い環境など
+            print(f"音声を初期化できませんでした: {e}")
+        startup_profiler.record("audio", start, "background")
+
+    thread = threading.Thread(target=worker, name="audio-loader", daemon=True)
+    thread.start()
+    return thread
 PURPLE = (200, 0, 200)
 ORANGE = (255, 120, 0)
 
 HP3_PROBABILITY = 0.10 # 10%の確率でHP 3 (超高耐久・超高得点)
 HP2_PROBABILITY = 0.20 # 20%の確率でHP 2 (高耐久・高得点)
+HP_SCORES = {1: 10, 2: 30, 3: 50} # 耐久度ごとの得点
+
+# 同時に存在できる数の上限（長時間プレイでもリストが増え続けないようにする）
+MAX_BALLS = 10
+MAX_ITEMS = 30
+MAX_ITEM3 = 10
+MAX_PARTICLES = 300
+
+# エンドレスモードの設定
+DROP_INTERVAL = 10            # ブロックを落とす間隔（秒）
+ENDLESS_MIN_DROP_INTERVAL = 3 # エンドレスモードでの最短の間隔（秒）
+ENDLESS_DROP_STEP = 6         # 1段落とすごとに間隔を縮めるフレーム数
+ENDLESS_LEVEL_ROWS = 10       # この段数ごとに高耐久ブロックの確率が上がる
+ENDLESS_HP_STEP = 0.02        # 1レベルごとに上がる確率
+ENDLESS_HP_MAX = 0.40         # 高耐久ブロックの確率の上限
+SOAK_MEMORY_SLACK = 1024 * 1024  # ソークテストで許すメモリの増加量（バイト）
+SOAK_WARMUP_FRAMES = FPS * 30    # ソークテストのウォームアップ（この時点のメモリを基準にする）
+SOAK_REPORT_FRAMES = FPS * 10    # ソークテストでメモリなどを記録する間隔（フレーム数）
+SOAK_MIN_SAMPLES = 4             # ウォームアップ後に最低限必要な記録の数
+SOAK_TREND_SLACK = 64 * 1024     # 後半の記録が前半を上回ってよい量（バイト、ゆらぎ分）
 
 # --- クラス定義 ---
 
@@ -89,17 +273,16 @@ class Particle:
         self.color = (*self.color[:3], alpha)
         return self.lifetime > 0
 
-    def draw(self, screen):
-        """パーティクルを描画"""
-        particle_surface = pg.Surface((self.size * 2, self.size * 2), pg.SRCALPHA)
-        pg.draw.circle(particle_surface, self.color, (self.size, self.size), self.size)
-        screen.blit(particle_surface, (int(self.x) - self.size, int(self.y) - self.size))
+    def render(self, camera):
+        """パーティクルの描画コマンドを返す"""
+        size = max(1, int(self.size * camera.scale))
+        return [("particle", self.color, camera.apply_point(self.x, self.y), size)]
 
 class Paddle:
     def __init__(self):
         self.rect = pg.Rect(
-            (SCREEN_WIDTH - PADDLE_WIDTH) // 2,
-            SCREEN_HEIGHT - PADDLE_HEIGHT - 20,
+            (WORLD_WIDTH - PADDLE_WIDTH) // 2,
+            WORLD_HEIGHT - PADDLE_HEIGHT - 20,
             PADDLE_WIDTH,
             PADDLE_HEIGHT
         )
@@ -114,19 +297,19 @@ class Paddle:
         # 画面外に出ないように制限
         if self.rect.left < 0:
             self.rect.left = 0
-        if self.rect.right > SCREEN_WIDTH:
-            self.rect.right = SCREEN_WIDTH
+        if self.rect.right > WORLD_WIDTH:
+            self.rect.right = WORLD_WIDTH
 
-    def draw(self, screen):
-        pg.draw.rect(screen, BLUE, self.rect)
+    def render(self, camera):
+        return [("rect", BLUE, tuple(camera.apply(self.rect)), 0)]
 
 class Ball:
     """ ボールのクラス (基本機能) """
     def __init__(self):
         # ... (既存の rect, vx, vy, speed の設定はそのまま) ...
         self.rect = pg.Rect(
-            SCREEN_WIDTH // 2 - BALL_RADIUS,
-            SCREEN_HEIGHT - PADDLE_HEIGHT - 50,
+            WORLD_WIDTH // 2 - BALL_RADIUS,
+            WORLD_HEIGHT - PADDLE_HEIGHT - 50,
             BALL_RADIUS * 2,
             BALL_RADIUS * 2
         )
@@ -151,10 +334,10 @@ class Ball:
             self.rect.top = 0
 
         # 壁との衝突 (左・右)
-        if self.rect.left < 0 or self.rect.right > SCREEN_WIDTH:
+        if self.rect.left < 0 or self.rect.right > WORLD_WIDTH:
             self.vx *= -1 
             if self.rect.left < 0: self.rect.left = 0
-            if self.rect.right > SCREEN_WIDTH: self.rect.right = SCREEN_WIDTH
+            if self.rect.right > WORLD_WIDTH: self.rect.right = WORLD_WIDTH
 
         # ラケットとの衝突
         if self.rect.colliderect(paddle.rect):
@@ -173,11 +356,11 @@ class Ball:
             # --- ▲ --------------------------------------------------- ▲ ---
 
 
-        # ブロックとの衝突判定
-        collided_index = self.rect.collidelist(blocks) 
-        if collided_index != -1: 
-            # 💡 (1) 衝突したブロックをインデックスで削除し、blockに代入
-            block = blocks.pop(collided_index) 
+        # ブロックとの衝突判定（空間インデックスでボール周辺のブロックだけを調べる）
+        hits = blocks.query(self.rect)
+        if hits: 
+            # 💡 (1) 衝突したブロックをblockに代入
+            block = hits[0]
             
             # --- ▼ 貫通状態の処理 ▼ ---
             if self.penetrate:
@@ -188,7 +371,7 @@ class Ball:
                 self.vy *= -1
 
                 # ブロックの耐久度を減らす
-                block.hp -= 1
+                blocks.damage(block)
                 
                 # 💡 (2) 破壊されたかどうかを判定
                 if block.hp <= 0:
@@ -196,15 +379,18 @@ class Ball:
                 else:
                     is_destroyed = False
                     
-                    # 💡 (3) HPが残っている場合は、ブロックをリストに戻し、処理を終了
-                    blocks.insert(collided_index, block)
+                    # 💡 (3) HPが残っている場合は、ブロックを残したまま処理を終了
                     return False, None # 破壊されていない
 
+            # 破壊されたブロックをインデックスから削除
+            blocks.remove(block)
+
             # 💡 (4) ブロックが破壊された（is_destroyed = True）場合のみ、以下の処理を実行
             if is_destroyed:
                 hit_score = block.score_value # スコアを取得
                 
                 # パーティクルエフェクトの生成（衝突したブロックの中心から）
+                # particlesは長さ上限つきのdequeなので、上限を超えると古いものから消える
                 for _ in range(10):  # 10個のパーティクルを生成
                     particles.append(
                         Particle(block.centerx, block.centery, (*WHITE, 255))
@@ -232,16 +418,17 @@ class Ball:
         return False, None # ブロックに当たらなかった
 
 
-    def draw(self, screen):
-        """ ボールを画面に描画 (円形) """
+    def render(self, camera):
+        """ ボールの描画コマンドを返す (円形) """
         # --- ▼ 状態に応じて描画を変更 ▼ ---
         radius = BALL_RADIUS * 2 if self.is_large else BALL_RADIUS
         color = GREEN if self.penetrate else WHITE
-        pg.draw.circle(screen, color, self.rect.center, radius)
+        return [("circle", color, camera.apply_point(*self.rect.center),
+                 max(1, int(radius * camera.scale)))]
         # --- ▲ ------------------------- ▲ ---
 
     def is_out_of_bounds(self):
-        return self.rect.top > SCREEN_HEIGHT
+        return self.rect.top > WORLD_HEIGHT
 
     # --- ▼ アイテム効果を適用するメソッドを追加 ▼ ---
     def set_penetrate(self, value):
@@ -280,9 +467,9 @@ class Block(pg.Rect):
         self.base_color = color # 元の色
         self.score_value = score_value # 破壊時の得点
 
-    def draw(self, screen):
+    def render(self, camera):
         #pg.draw.rect(screen, self.color, self)
-        """ ブロックを画面に描画 """
+        """ ブロックの描画コマンドを返す """
         if self.hp > 1:
             color_to_draw = self.base_color
             if self.hp == 2:
@@ -292,10 +479,201 @@ class Block(pg.Rect):
         else:
             color_to_draw = self.base_color
         
-        pg.draw.rect(screen, color_to_draw, self)
+        rect = tuple(camera.apply(self))
+        commands = [("rect", color_to_draw, rect, 0)]
         if self.hp > 1:
-            pg.draw.rect(screen, WHITE, self, 3)
-         
+            commands.append(("rect", WHITE, rect, max(1, int(3 * camera.scale))))
+        return commands
+
+
+class BlockGrid:
+    """
+    ブロックの空間インデックス（一様グリッド）
+    ボールの衝突判定や描画のカリングで、全ブロックを毎フレーム走査しないために使う
+    """
+    def __init__(self, cols=BOARD_COLS):
+        self.cols = cols
+        self.cell_w = BLOCK_WIDTH + 8   # セルの横幅（ブロック1列分）
+        self.cell_h = BLOCK_HEIGHT + 5  # セルの縦幅（ブロック1段分）
+        self.origin_x = 20  # グリッドの原点（左マージン20px。1ブロックがちょうど1セルに収まる）
+        self.origin_y = 30  # グリッドの原点（最上段のY座標30px）
+        self.offset_y = 0   # 全体を下に移動した量（セル番号をずらさずに済むようにする）
+        self.cells = {}     # (列, 行) -> そのセルに重なるブロックのリスト
+        self.blocks = {}    # id(block) -> block（追加順を保つ）
+        self.block_cells = {}  # id(block) -> 登録したセルのリスト
+        # 配信用：盤面の段ごとの耐久度（create_block_rowの配置での列・段番号。0は空き）
+        self.hp_rows = {}      # 段番号 -> bytearray(cols)
+        self.row_counts = {}   # 段番号 -> その段のブロック数
+        self.block_slots = {}  # id(block) -> (列, 段)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __iter__(self):
+        return iter(list(self.blocks.values()))
+
+    def _cells_for(self, rect):
+        """ rectが重なるセルの一覧を返す """
+        left = (rect.left - self.origin_x) // self.cell_w
+        right = (rect.right - 1 - self.origin_x) // self.cell_w
+        top = (rect.top - self.offset_y - self.origin_y) // self.cell_h
+        bottom = (rect.bottom - 1 - self.offset_y - self.origin_y) // self.cell_h
+        return [(cx, cy) for cy in range(top, bottom + 1) for cx in range(left, right + 1)]
+
+    def add(self, block):
+        """ ブロックを登録する """
+        keys = self._cells_for(block)
+        for key in keys:
+            self.cells.setdefault(key, []).append(block)
+        self.blocks[id(block)] = block
+        self.block_cells[id(block)] = keys
+
+        col, row = keys[0]  # 盤面の配置ではブロックの左上のセルが列・段になる
+        if 0 <= col < self.cols:
+            if row not in self.hp_rows:
+                self.hp_rows[row] = bytearray(self.cols)
+                self.row_counts[row] = 0
+            self.hp_rows[row][col] = block.hp
+            self.row_counts[row] += 1
+            self.block_slots[id(block)] = (col, row)
+
+    def extend(self, blocks):
+        for block in blocks:
+            self.add(block)
+
+    def remove(self, block):
+        """ ブロックを削除する（登録されていなければ何もしない） """
+        keys = self.block_cells.pop(id(block), None)
+        if keys is None:
+            return
+        del self.blocks[id(block)]
+        for key in keys:
+            cell = self.cells[key]
+            cell.remove(block)
+            if not cell:
+                del self.cells[key]
+
+        slot = self.block_slots.pop(id(block), None)
+        if slot is not None:
+            col, row = slot
+            self.hp_rows[row][col] = 0
+            self.row_counts[row] -= 1
+            if not self.row_counts[row]:
+                del self.hp_rows[row]
+                del self.row_counts[row]
+
+    def damage(self, block):
+        """ ブロックの耐久度を1減らす """
+        block.hp -= 1
+        slot = self.block_slots.get(id(block))
+        if slot is not None:
+            col, row = slot
+            self.hp_rows[row][col] = max(0, block.hp)
+
+    def hp_grid(self):
+        """
+        盤面の耐久度を段ごとに詰めたバイト列で返す
+        戻り値: (最上段のY座標, 段数, 段数×cols バイト)
+        """
+        if not self.hp_rows:
+            return 0, 0, b""
+        top = min(self.hp_rows)
+        bottom = max(self.hp_rows)
+        empty = bytes(self.cols)
+        data = b"".join(self.hp_rows.get(row, empty) for row in range(top, bottom + 1))
+        return self.origin_y + top * self.cell_h + self.offset_y, bottom - top + 1, data
+
+    def query(self, rect):
+        """ rectと重なるブロックを返す """
+        found = {}
+        for key in self._cells_for(rect):
+            for block in self.cells.get(key, ()):
+                if block.colliderect(rect):
+                    found[id(block)] = block
+        return list(found.values())
+
+    def shift_down(self, dy):
+        """
+        全ブロックをdyだけ下に移動する
+        戻り値: 移動後の最も下にあるブロックの下端（ブロックが無ければNone）
+        """
+        self.offset_y += dy
+        lowest = None
+        for block in self.blocks.values():
+            block.y += dy
+            if lowest is None or block.bottom > lowest:
+                lowest = block.bottom
+        return lowest
+
+    def random_block(self):
+        return random.choice(list(self.blocks.values()))
+
+
+class Camera:
+    """
+    ワールド座標から画面座標への変換と、画面外オブジェクトのカリングを行うクラス
+    """
+    def __init__(self, width, height, pixel_scale=1.0):
+        self.width = width    # 画面（ビューポート）の横幅（論理座標）
+        self.height = height  # 画面（ビューポート）の縦幅（論理座標）
+        self.pixel_scale = pixel_scale  # 論理座標 → 内部解像度のピクセルの倍率
+        self.zoom = 1.0       # プレイヤーが選んだズーム（これより寄ることはない）
+        self.view_zoom = 1.0  # 実際のズーム（ボールが入りきらないときは引く）
+        self.scale = pixel_scale  # ワールド座標 → ピクセルの倍率（view_zoom × pixel_scale）
+        # ワールド上で見えている範囲
+        self.view = pg.Rect(0, 0, width, height)
+
+    def set_zoom(self, zoom):
+        self.zoom = min(ZOOM_MAX, max(ZOOM_MIN, zoom))
+        self.view_zoom = self.zoom
+        self.scale = self.zoom * self.pixel_scale
+
+    def follow(self, keep, target=None):
+        """
+        keep（ラケット）を必ず画面内に入れ、target（ボール）もできるだけ一緒に映す
+        両方が入りきらないときはZOOM_STEP刻みで引き、それでも入らなければkeepを優先する
+        （ワールドの外は映さない）
+        """
+        zoom = self.zoom
+        focus_y = keep.centery
+        if target is not None:
+            span = max(keep.bottom, target.bottom) - min(keep.top, target.top) + CAMERA_MARGIN * 2
+            while zoom > ZOOM_MIN and span > self.height / zoom:
+                zoom = max(ZOOM_MIN, zoom - ZOOM_STEP)
+            if span <= self.height / zoom:
+                focus_y = (min(keep.top, target.top) + max(keep.bottom, target.bottom)) // 2
+        self.view_zoom = zoom
+        self.scale = zoom * self.pixel_scale
+
+        self.view.size = (int(self.width / zoom), int(self.height / zoom))
+        self.view.center = (int(keep.centerx), int(focus_y))
+        # ラケットが画面からはみ出さないように寄せる
+        if self.view.bottom < keep.bottom + CAMERA_MARGIN:
+            self.view.bottom = keep.bottom + CAMERA_MARGIN
+        if self.view.top > keep.top - CAMERA_MARGIN:
+            self.view.top = keep.top - CAMERA_MARGIN
+        if self.view.width >= WORLD_WIDTH:
+            self.view.centerx = WORLD_WIDTH // 2
+        else:
+            self.view.left = min(max(self.view.left, 0), WORLD_WIDTH - self.view.width)
+        if self.view.height >= WORLD_HEIGHT:
+            self.view.top = WORLD_HEIGHT - self.view.height
+        else:
+            self.view.top = min(max(self.view.top, 0), WORLD_HEIGHT - self.view.height)
+
+    def apply_point(self, x, y):
+        return (int((x - self.view.left) * self.scale),
+                int((y - self.view.top) * self.scale))
+
+    def apply(self, rect):
+        """ ワールド座標のrectを画面座標のrectに変換する """
+        x, y = self.apply_point(rect.left, rect.top)
+        return pg.Rect(x, y, max(1, int(rect.width * self.scale)),
+                       max(1, int(rect.height * self.scale)))
+
+    def is_visible(self, rect):
+        return self.view.colliderect(rect)
+
 
 class item1:
     """
@@ -304,8 +682,8 @@ class item1:
     """
     def __init__(self, paddle_original_width):
         self.paddle_extend_active = False
-        self.extend_start_time = 0
-        self.EXTEND_DURATION = 10000 # 10秒 = 10000 ms
+        self.extend_timer = 0  # 巨大化の残りフレーム数
+        self.EXTEND_DURATION = 10 * FPS # 10秒（フレーム数で数える）
         self.original_width = paddle_original_width
         self.extended_width = int(paddle_original_width * 1.5) 
 
@@ -316,7 +694,7 @@ class item1:
         """
         if effect_name == "extend_paddle": # ラケット巨大化
             self.paddle_extend_active = True
-            self.extend_start_time = pg.time.get_ticks()
+            self.extend_timer = self.EXTEND_DURATION
             center_x = paddle.rect.centerx
             paddle.rect.width = self.extended_width
             paddle.rect.centerx = center_x
@@ -326,7 +704,8 @@ class item1:
             return 1 # mainループ側でlifeを1増やす
 
         elif effect_name == "increase_ball": # ボール増加
-            balls.append(Ball()) 
+            if len(balls) < MAX_BALLS:
+                balls.append(Ball()) 
             return 0
         
         return 0 # 担当外のアイテム
@@ -337,9 +716,8 @@ class item1:
         """
         if not self.paddle_extend_active:
             return
-        current_time = pg.time.get_ticks()
-        elapsed_time = current_time - self.extend_start_time
-        if elapsed_time > self.EXTEND_DURATION:
+        self.extend_timer -= 1
+        if self.extend_timer <= 0:
             self.paddle_extend_active = False
             center_x = paddle.rect.centerx
             paddle.rect.width = self.original_width
@@ -379,9 +757,9 @@ class Item(pg.Rect):
         """ アイテムを下に移動させる """
         self.move_ip(0, self.speed)
 
-    def draw(self, screen):
-        """ アイテムを描画する（色分け） """
-        pg.draw.rect(screen, self.color, self)
+    def render(self, camera):
+        """ アイテムの描画コマンドを返す（色分け） """
+        return [("rect", self.color, tuple(camera.apply(self)), 0)]
 
     def check_collision(self, paddle_rect):
         """ ラケットとの衝突を判定する """
@@ -412,15 +790,18 @@ class Item2(pg.Rect):
         """ アイテムを下に移動させる """
         self.move_ip(0, self.speed)
 
-    def draw(self, screen):
-        """ アイテムを描画する（色分け） """
-        pg.draw.rect(screen, self.color, self)
+    def render(self, camera):
+        """ アイテムの描画コマンドを返す（色分け） """
+        return [("rect", self.color, tuple(camera.apply(self)), 0)]
     
     def check_collision(self, paddle_rect):
         """ ラケットとの衝突を判定する """
         return self.colliderect(paddle_rect)
 
 # --- Item3：爆弾・助っ人こうかとん ---
+HELPER_IMAGE = "koukaton.jpg"  # 助っ人こうかとんの画像
+HELPER_IMAGE_SIZE = 50         # 助っ人こうかとんの表示サイズ（論理座標）
+
 class Item3:
     def __init__(self, x, y, item_type):
         self.item_type = item_type
@@ -440,8 +821,10 @@ class Item3:
         else:
             self.rect.move_ip(self.vx, 0)
             if blocks:
-                # 横方向で重なったブロックだけ削除
-                for block in blocks[:]:
+                # 横方向で重なったブロックだけ削除（同じ行の周辺だけをインデックスで探す）
+                row_rect = pg.Rect(self.rect.left, self.row_y - BLOCK_HEIGHT // 2,
+                                   self.rect.width, BLOCK_HEIGHT)
+                for block in blocks.query(row_rect):
                     if abs(block.centery - self.row_y) < BLOCK_HEIGHT // 2 and \
                        block.left < self.rect.right and block.right > self.rect.left:
                         blocks.remove(block)
@@ -449,21 +832,32 @@ class Item3:
             if self.life <= 0 or self.rect.right < 0:
                 self.active = False
 
-    def draw(self, screen):
+    def render(self, camera):
+        rect = camera.apply(self.rect)
         if self.active and self.image:
-            screen.blit(self.image, self.rect)
-        else:
-            pg.draw.rect(screen, self.color, self.rect)
+            image = self.image
+            if camera.scale != 1.0:
+                # 倍率ごとに拡大縮小した画像をキャッシュしておき、毎フレームは拡大縮小しない
+                size = max(1, int(HELPER_IMAGE_SIZE * camera.scale))
+                image = load_image(HELPER_IMAGE, (size, size))
+            return [("image", image, tuple(rect), 0)]
+        return [("rect", self.color, tuple(rect), 0)]
 
     def check_collision(self, paddle_rect):
         return self.rect.colliderect(paddle_rect)
 
-    def activate(self, blocks):
+    def activate(self, blocks, view):
+        """
+        効果を発動する
+        引数 blocks: ブロックの空間インデックス
+        引数 view: カメラが映しているワールド上の範囲（助っ人こうかとんはこの右端から出る）
+        """
         if self.item_type == "bomb":
             if not blocks: return
-            target = random.choice(blocks)
+            target = blocks.random_block()
+            area = target.inflate(BLOCK_WIDTH * 2 + 10, BLOCK_HEIGHT * 2 + 10)
             destroyed = []
-            for block in blocks[:]:
+            for block in blocks.query(area):
                 if abs(block.centerx - target.centerx) <= BLOCK_WIDTH + 5 and \
                    abs(block.centery - target.centery) <= BLOCK_HEIGHT + 5:
                     destroyed.append(block)
@@ -471,45 +865,110 @@ class Item3:
                 blocks.remove(b)
         else:
             try:
-                self.image = pg.image.load("koukaton.jpg")
-                self.image = pg.transform.scale(self.image, (50, 50))
+                self.image = load_image(HELPER_IMAGE, (HELPER_IMAGE_SIZE, HELPER_IMAGE_SIZE))
             except:
                 self.image = None
             self.active = True
-            self.life = 200
-            # 一番上の行から右端に出現
+            # 画面の右端から左端まで横切るのに必要なフレーム数だけ動く
+            self.life = math.ceil((view.width + self.rect.width) / -self.vx)
+            # 一番上の行から画面の右端に出現
             if blocks:
-                rows = sorted(list(set(block.centery for block in blocks)))
-                self.row_y = rows[0]
+                self.row_y = min(block.centery for block in blocks)
                 self.rect.centery = self.row_y
-            self.rect.right = SCREEN_WIDTH
+            self.rect.right = min(view.right, WORLD_WIDTH)
 
 # --- メイン処理 ---
-def create_block_row(y: int) -> list[Block]:
+def set_board_size(cols: int, rows: int):
+    """
+    盤面の列数・初期行数に合わせてワールドの大きさとゲームオーバーラインを設定
+    引数 cols: 列数
+    引数 rows: 初期行数
+    """
+    global WORLD_WIDTH, WORLD_HEIGHT, GAME_OVER_LINE
+    WORLD_WIDTH = max(SCREEN_WIDTH, cols * (BLOCK_WIDTH + 8) + 20)
+    WORLD_HEIGHT = max(SCREEN_HEIGHT, rows * (BLOCK_HEIGHT + 5) + 460)
+    GAME_OVER_LINE = WORLD_HEIGHT - 150
+
+def random_row(cols: int, rng=random, hp3=HP3_PROBABILITY, hp2=HP2_PROBABILITY) -> list[int]:
+    """
+    1行分の耐久度をランダムに決める
+    戻り値: 列ごとの耐久度のリスト
+    """
+    row = []
+    for _ in range(cols):
+        rand_val = rng.random()
+        if rand_val < hp3:
+            row.append(3)
+        elif rand_val < hp3 + hp2:
+            row.append(2)
+        else:
+            row.append(1)
+    return row
+
+def random_row_stream(cols: int, seed=None):
+    """
+    エンドレスモード用：ランダムな行を無限に生成するジェネレータ
+    ENDLESS_LEVEL_ROWS段ごとに高耐久ブロックの確率が上がる
+    引数 seed: 乱数のシード（同じシードなら同じ並びになる）
+    """
+    rng = random.Random(seed)
+    rows = 0
+    while True:
+        level = rows // ENDLESS_LEVEL_ROWS
+        hp3 = min(ENDLESS_HP_MAX, HP3_PROBABILITY + level * ENDLESS_HP_STEP)
+        hp2 = min(ENDLESS_HP_MAX, HP2_PROBABILITY + level * ENDLESS_HP_STEP)
+        yield random_row(cols, rng, hp3, hp2)
+        rows += 1
+
+def load_level_pack(path: str, cols: int) -> list[list[int]]:
+    """
+    レベルパックのファイルを読み込んで検査する
+    1行が1段で、各文字が1列の耐久度（0は空き、1〜3）。空行は無視し、cols列に切り詰め・0埋めする
+    戻り値: 段ごとの耐久度のリスト
+    例外: ファイルが読めなければOSError、内容が不正ならValueError
+    """
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip()
+            if not line:
+                continue
+            for ch in line:
+                if ch not in "0123":
+                    raise ValueError(f"{path}:{number}: 使えない文字があります（0〜3のみ）: {ch!r}")
+            rows.append([int(ch) for ch in line.ljust(cols, "0")[:cols]])
+    if not rows:
+        raise ValueError(f"レベルパックに行がありません: {path}")
+    return rows
+
+def level_pack_stream(rows: list[list[int]]):
+    """
+    エンドレスモード用：レベルパック（load_level_packの結果）から行を生成するジェネレータ
+    最後まで行ったら最初から繰り返す
+    """
+    while True:
+        for row in rows:
+            yield list(row)
+
+def create_block_row(y: int, cols: int = BOARD_COLS, row: list[int] | None = None) -> list[Block]:
     """
     指定のy座標にブロックの新しい1行を生成
     引数 y: ブロックのy座標
+    引数 cols: 列数
+    引数 row: 列ごとの耐久度（0は空き）。省略するとランダム
     戻り値: 生成したブロックのリスト
     """
     new_blocks = []
     base_color = WHITE 
     
     # グローバルな確率定数を使用
+    if row is None:
+        row = random_row(cols)
 
-    for x in range(10):  # 10列
-        hp = 1
-        score_value = 10 
-        rand_val = random.random()
-
-        if rand_val < HP3_PROBABILITY:
-            hp = 3
-            score_value = 50
-        elif rand_val < HP3_PROBABILITY + HP2_PROBABILITY:
-            hp = 2
-            score_value = 30
-        else:
-            hp = 1
-            score_value = 10
+    for x, hp in enumerate(row):
+        if hp <= 0:
+            continue # 空き
+        score_value = HP_SCORES[hp]
 
         block = Block(
             x * (BLOCK_WIDTH + 8) + 20,  # X座標 (隙間5px, 左マージン20px)
@@ -521,92 +980,32 @@ def create_block_row(y: int) -> list[Block]:
         new_blocks.append(block)
     return new_blocks
 
-def move_blocks_down(blocks: list[Block]) -> bool:
+def move_blocks_down(blocks: BlockGrid) -> bool:
     """
     全てのブロックを1段下に移動
-    引数 blocks: ブロックのリスト
+    引数 blocks: ブロックの空間インデックス
     戻り値: ゲームオーバー（ブロックが下限に達したか）
     """
-    for block in blocks:
-        block.y += BLOCK_HEIGHT + 5  # ブロック1個分（+隙間）下に移動
-        if block.bottom >= GAME_OVER_LINE:  # ゲームオーバーライン
-            return True
-    return False
+    lowest = blocks.shift_down(BLOCK_HEIGHT + 5)  # ブロック1個分（+隙間）下に移動
+    return lowest is not None and lowest >= GAME_OVER_LINE  # ゲームオーバーライン
 
-def main():
-    """ メインのゲームループ """
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-    # Pygameの初期化
-    pg.init()
-    screen = pg.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pg.display.set_caption("ウォールブレイカー")
-    clock = pg.time.Clock()
-    font = pg.font.Font(None, 50) 
-    
-    # 効果音のロード
-    sounds = load_sounds()
+class RenderSnapshot(NamedTuple):
+    """
+    1フレーム分の描画内容（シミュレーション側が作り、描画側は読むだけ）
+    commands は画面座標に変換済みの描画コマンドのタプル
+    """
+    frame: int
+    commands: tuple
+    line_y: int
+    score: int
+    life: int
+    game_over: bool
+    game_clear: bool
 
-    paddle = Paddle()
-    
-    # ボールはリスト管理
-    balls = [Ball()] 
-    
-    # 落下アイテムリスト
-    items = [] 
 
-    item3_list = []
-    
-    blocks = []
-    
-    # 担当アイテムマネージャー
-    item_manager_ishii = item1(PADDLE_WIDTH) 
-    particles = []  # パーティクルのリストを追加
-    # --- ▼ アイテムリストを追加 ▼ ---
-    items = [] # 落下中のアイテムを管理するリスト
-    # --- ▲ ------------------- ▲ ---
-
-    # ... (ブロックの配置 はそのまま) ...
-    # block_colors = [RED, YELLOW, GREEN, BLUE]
-
-    # HP3_PROBABILITY = 0.20 # 10%の確率でHP 3 (超高耐久・超高得点)
-    # HP2_PROBABILITY = 0.30 # 20%の確率でHP 2 (高耐久・高得点)
-
-    for y in range(4): 
-        for x in range(10): 
-            hp = 1
-            score_value = 10 
-            rand_val = random.random()
-
-            if rand_val < HP3_PROBABILITY:
-                hp = 3
-                score_value = 50
-            elif rand_val < HP3_PROBABILITY + HP2_PROBABILITY:
-                hp = 2
-                score_value = 30
-            else:
-                hp = 1
-                score_value = 10
-            color = WHITE
-                
-            block = Block(
-                x * (BLOCK_WIDTH + 8) + 20, # <--- 隙間を広げ、配置を見やすく調整
-                y * (BLOCK_HEIGHT + 5) + 30, 
-                color,
-                hp=hp,             
-                score_value=score_value
-            )
-            blocks.append(block)
-
-    score = 0
-    life = 1
-    game_over = False
-    game_clear = False
-    
-    # ブロック移動の管理用変数
-    last_drop_time = time.time()  # 最後にブロックを落とした時刻
-    DROP_INTERVAL = 10  # ブロックを落とす間隔（秒）
-    
+class Game:
+    """ ゲームの状態と1フレーム分のシミュレーション """
     # (ダミー) 担当分のアイテムのみ抽選
     MY_ITEM_TYPES = [
         "extend_paddle", # item1
@@ -618,47 +1017,106 @@ def main():
         "helper"        #item3
     ]
 
-    # --- ゲームループ ---
-    while True:
-        # --- イベント処理 ---
-        for event in pg.event.get():
-            if event.type == pg.QUIT:
-                pg.quit()
-                sys.exit()
-            if event.type == pg.KEYDOWN:
-                if event.key == pg.K_r and (game_over or game_clear):
-                    main() # ゲームリスタート
-                    return
-                
-                # --- デバッグキー (コメントアウト) ---
-                # '1'キーでラケット巨大化アイテムを強制ドロップ
-                # if event.key == pg.K_1:
-                #     item = Item(SCREEN_WIDTH // 2, 0, "extend_paddle")
-                #     items.append(item)
-                # '2'キーで残機増加アイテムを強制ドロップ
-                # elif event.key == pg.K_2:
-                #     item = Item(SCREEN_WIDTH // 2, 0, "increase_life")
-                #     items.append(item)
-                # '3'キーでボール増加アイテムを強制ドロップ
-                # elif event.key == pg.K_3:
-                #     item = Item(SCREEN_WIDTH // 2, 0, "increase_ball")
-                #     items.append(item)
-
-        if not game_over and not game_clear:
-            keys = pg.key.get_pressed()
+    def __init__(self, cols, rows, sounds, render_scale=RENDER_SCALE, row_stream=None):
+        self.cols = cols
+        self.sounds = sounds
+        self.row_stream = row_stream  # エンドレスモードの行の供給元（通常モードはNone）
+        self.camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, render_scale)
+        self.frame = 0
+
+        self.paddle = Paddle()
+        
+        # ボールはリスト管理
+        self.balls = [Ball()] 
+        
+        # 落下アイテムリスト
+        self.items = [] 
+
+        self.item3_list = []
+        
+        self.blocks = BlockGrid(cols)
+        
+        # 担当アイテムマネージャー
+        self.item_manager_ishii = item1(PADDLE_WIDTH) 
+        self.particles = collections.deque(maxlen=MAX_PARTICLES)  # パーティクル（上限を超えると古いものから消える）
+
+        if row_stream is None:
+            for y in range(rows): 
+                self.blocks.extend(create_block_row(y * (BLOCK_HEIGHT + 5) + 30, cols))
+        else:
+            # 先に生成された行ほど下にくるように並べる
+            for y in reversed(range(rows)):
+                self.blocks.extend(self.next_row(y * (BLOCK_HEIGHT + 5) + 30))
+
+        self.score = 0
+        self.life = 1
+        self.game_over = False
+        self.game_clear = False
+        
+        # ブロック移動の管理用変数（フレーム数で数える）
+        self.drop_timer = 0                       # 最後にブロックを落としてからのフレーム数
+        self.drop_interval = DROP_INTERVAL * FPS  # ブロックを落とす間隔（フレーム数）
+
+    @property
+    def endless(self):
+        return self.row_stream is not None
+
+    def next_row(self, y):
+        """ 新しい1行を生成する（エンドレスモードでは行の供給元から取り出す） """
+        if self.row_stream is None:
+            return create_block_row(y, self.cols)
+        return create_block_row(y, self.cols, next(self.row_stream))
+
+    def handle_key(self, key):
+        """ KEYDOWNイベントのうち、ゲーム内の状態を変えるものを処理する """
+        # -/= キーでズームアウト・ズームイン
+        if key == pg.K_MINUS:
+            self.camera.set_zoom(self.camera.zoom - ZOOM_STEP)
+        elif key == pg.K_EQUALS:
+            self.camera.set_zoom(self.camera.zoom + ZOOM_STEP)
+        
+        # --- デバッグキー (コメントアウト) ---
+        # '1'キーでラケット巨大化アイテムを強制ドロップ
+        # if key == pg.K_1:
+        #     item = Item(SCREEN_WIDTH // 2, 0, "extend_paddle")
+        #     self.items.append(item)
+        # '2'キーで残機増加アイテムを強制ドロップ
+        # elif key == pg.K_2:
+        #     item = Item(SCREEN_WIDTH // 2, 0, "increase_life")
+        #     self.items.append(item)
+        # '3'キーでボール増加アイテムを強制ドロップ
+        # elif key == pg.K_3:
+        #     item = Item(SCREEN_WIDTH // 2, 0, "increase_ball")
+        #     self.items.append(item)
+
+    def play_sound(self, name):
+        if self.sounds.get(name):
+            self.sounds[name].play()
+
+    def update(self, keys):
+        """ 1フレーム分ゲームを進める（keysはpg.key.get_pressed()の結果） """
+        self.frame += 1
+        paddle = self.paddle
+        blocks = self.blocks
+
+        if not self.game_over and not self.game_clear and keys is not None:
             paddle.update(keys)
             # すべてのボールを更新
-        for ball in balls[:]:
+        for ball in self.balls[:]:
             # ブロック判定＋パーティクル＆音
-            block_hit, destroyed_block = ball.update(paddle, blocks, particles, sounds.get("break"))
+            block_hit, destroyed_block = ball.update(paddle, blocks, self.particles, self.sounds.get("break"))
 
             if block_hit:  # ブロックに当たったら
-                score += 10  # スコア加算
+                self.score += 10  # スコア加算
 
                 # --- アイテムドロップ処理 (抽選処理のダミー) ---
                 # 30%の確率で担当アイテムをドロップ
-                if random.random() < 0.3: 
-                    item_type = random.choice(MY_ITEM_TYPES)
+                if random.random() < 0.3 and len(self.items) < MAX_ITEMS: 
+                    item_types = self.MY_ITEM_TYPES
+                    if len(self.item3_list) >= MAX_ITEM3:
+                        # 助っ人こうかとんがいっぱいのときは助っ人アイテムを落とさない
+                        item_types = [t for t in item_types if t != "helper"]
+                    item_type = random.choice(item_types)
                                     
                 #item_typeに応じて生成するクラスを分ける
                     if item_type in ["penetrate", "large_ball"]:
@@ -666,11 +1124,14 @@ def main():
                     else:
                         item = Item(destroyed_block.centerx, destroyed_block.centery, item_type)
                         
-                    items.append(item) # アイテムをリストに追加
+                    self.items.append(item) # アイテムをリストに追加
             
 
         # --- 落下アイテムの更新とラケットとの衝突判定 ---
-        for item in items[:]: # リストのコピーをイテレート
+        # 残すアイテムだけで新しいリストを作る（ループ中にremoveしない）
+        items = self.items
+        self.items = []
+        for item in items:
             item.update() # アイテムを落下
                 
             # ラケットと衝突したら
@@ -678,122 +1139,781 @@ def main():
                 item_type = item.item_type # "extend_paddle" などを取得
                     
                 # --- item1の効果発動 ---
-                life_change = item_manager_ishii.activate(item_type, balls, paddle)
-                life += life_change # 残機を更新
-                if life > 5:
-                    life = 5
+                life_change = self.item_manager_ishii.activate(item_type, self.balls, paddle)
+                self.life += life_change # 残機を更新
+                if self.life > 5:
+                    self.life = 5
                 
                 # --- item2の効果発動 ---
                 if item_type in ["large_ball", "penetrate"]:
-                    for ball in balls:
+                    for ball in self.balls:
                         if item_type == "large_ball":
                             ball.set_size(True) # 巨大化
                         elif item_type == "penetrate":
                             ball.set_penetrate(True) # 貫通化 
 
                 # --- item3の効果発動 ---
-                if item_type in ["bomb", "helper"]:
+                # 助っ人こうかとんは上限に空きがあるときだけ出す（爆弾はいつでもすぐ発動）
+                room = len(self.item3_list) < MAX_ITEM3
+                if item_type == "bomb" or (item_type == "helper" and room):
                     # Item3のインスタンスを生成して効果発動
                     item3 = Item3(item.centerx, item.centery, item_type)
-                    item3.activate(blocks)
-                    item3_list.append(item3)
+                    item3.activate(blocks, self.camera.view)
+                    if room:
+                        self.item3_list.append(item3)
 
-                items.remove(item) # アイテムをリストから削除
-                
-            # 画面外に出たら削除
-            elif item.top > SCREEN_HEIGHT:
-                items.remove(item)
+            # 画面外に出たものと取ったものは残さない
+            elif item.top <= WORLD_HEIGHT:
+                self.items.append(item)
             
         # ラケット巨大化タイマーの更新
-        item_manager_ishii.update(paddle)
+        self.item_manager_ishii.update(paddle)
             
         # 画面外に落ちたボールをリストから削除
-        balls = [ball for ball in balls if not ball.is_out_of_bounds()]
+        self.balls = [ball for ball in self.balls if not ball.is_out_of_bounds()]
 
         # ボールが0個になったら残機を減らす
-        if not balls and not game_clear and not game_over:
-            life -= 1
-            if life > 0:
-                balls.append(Ball()) 
-                paddle = Paddle() 
+        if not self.balls and not self.game_clear and not self.game_over:
+            self.life -= 1
+            if self.life > 0:
+                self.balls.append(Ball()) 
+                self.paddle = Paddle() 
             else:
-                if not game_over: 
-                    game_over = True 
-                    if sounds.get("defeat"):
-                        sounds["defeat"].play()
+                if not self.game_over: 
+                    self.game_over = True 
+                    self.play_sound("defeat")
             
-        # ブロックの移動と新しい行の追加（5秒ごと）
-        current_time = time.time()
-        if current_time - last_drop_time >= DROP_INTERVAL:
+        # ブロックの移動と新しい行の追加（drop_intervalフレームごと）
+        self.drop_timer += 1
+        if self.drop_timer >= self.drop_interval:
             # 全ブロックを1段下に移動
             if move_blocks_down(blocks):
-                game_over = True  # ブロックが下限に達したらゲームオーバー
+                self.game_over = True  # ブロックが下限に達したらゲームオーバー
                 # ゲームオーバー効果音を再生
-                if sounds.get("defeat"):
-                    sounds["defeat"].play()
+                self.play_sound("defeat")
             else:
                 # 最上段に新しい行を追加
-                blocks.extend(create_block_row(30))  # 上端のY座標（30px）
-            last_drop_time = current_time
-
-        # ゲームクリア判定
+                blocks.extend(self.next_row(30))  # 上端のY座標（30px）
+                if self.endless:
+                    # 1段ごとに落ちてくる間隔を短くする
+                    self.drop_interval = max(ENDLESS_MIN_DROP_INTERVAL * FPS,
+                                             self.drop_interval - ENDLESS_DROP_STEP)
+            self.drop_timer = 0
+
+        # ゲームクリア判定（エンドレスモードではクリアせず、すぐに次の段を落とす）
         if not blocks:
-            game_clear = True
-
-        # 描画処理
-        screen.fill(BLACK) 
-        
-        # ゲームオーバーラインを描画（点線で表示）
-        dash_length = 15  # 点線の長さ
-        gap_length = 10   # 点線の間隔
-        for x in range(0, SCREEN_WIDTH, dash_length + gap_length):
-            pg.draw.line(screen, RED, (x, GAME_OVER_LINE), (x + dash_length, GAME_OVER_LINE), 2)
-            
-        paddle.draw(screen)
-        
-        for ball in balls: # すべてのボールを描画
-            ball.draw(screen)
-        for block in blocks:
-            block.draw(screen)
-        
-        # パーティクルの描画
-        for particle in particles[:]:
-            if particle.update():
-                particle.draw(screen)
+            if self.endless:
+                self.drop_timer = self.drop_interval
             else:
-                particles.remove(particle)
+                self.game_clear = True
 
-        # --- ▼ アイテムの描画 ▼ ---
-        for item in items:
-            item.draw(screen)
-        # --- ▲ ----------------- ▲ ---
+        # パーティクルの更新
+        self.particles = collections.deque(
+            (particle for particle in self.particles if particle.update()), maxlen=MAX_PARTICLES)
 
-        # --- Item3 の更新・描画 ---
-        for i3 in item3_list[:]:
+        # --- Item3 の更新 ---
+        for i3 in self.item3_list:
             i3.update(blocks)
-            i3.draw(screen)
-            if not i3.active and i3.rect.top > SCREEN_HEIGHT:
-                item3_list.remove(i3)
+        self.item3_list = [i3 for i3 in self.item3_list
+                           if i3.active or i3.rect.top <= WORLD_HEIGHT]
+
+        # カメラはラケットを必ず映し、一番下のボールも入るなら一緒に映す
+        target = None
+        if self.balls:
+            target = max(self.balls, key=lambda ball: ball.rect.bottom).rect
+        self.camera.follow(self.paddle.rect, target)
+
+    def snapshot(self):
+        """ 画面内に見えているものだけを描画コマンドにまとめたスナップショットを返す """
+        camera = self.camera
+        commands = []
+        commands += self.paddle.render(camera)
+        for ball in self.balls: # すべてのボールを描画
+            if camera.is_visible(ball.rect):
+                commands += ball.render(camera)
+        for block in self.blocks.query(camera.view):
+            commands += block.render(camera)
+        for particle in self.particles:
+            if camera.view.collidepoint(particle.x, particle.y):
+                commands += particle.render(camera)
+        for item in self.items:
+            if camera.is_visible(item):
+                commands += item.render(camera)
+        for i3 in self.item3_list:
+            if camera.is_visible(i3.rect):
+                commands += i3.render(camera)
+        return RenderSnapshot(
+            self.frame,
+            tuple(commands),
+            camera.apply_point(0, GAME_OVER_LINE)[1],
+            self.score,
+            self.life,
+            self.game_over,
+            self.game_clear,
+        )
 
 
-        # ... (スコア表示、ゲームオーバー / クリア表示 はそのまま) ...
-        score_text = font.render(f"SCORE: {score}", True, WHITE)
-        screen.blit(score_text, (10, 10))
-        life_text = font.render(f"LIFE: {life}", True, WHITE)
-        screen.blit(life_text, (SCREEN_WIDTH - life_text.get_width() - 10, 10))
+class SnapshotBuffer:
+    """
+    描画用スナップショットのダブルバッファ
+    書き込み側は裏側に書いてから表裏を入れ替えるので、読み込み側は常に完成したものを受け取る
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = [None, None]
+        self._front = 0
 
+    def publish(self, snapshot):
+        back = 1 - self._front
+        self._slots[back] = snapshot
+        with self._lock:
+            self._front = back
 
+    def latest(self):
+        with self._lock:
+            return self._slots[self._front]
 
-        if game_over:
-            over_text = font.render("GAME OVER - Press R to Restart", True, RED)
-            screen.blit(over_text, (100, SCREEN_HEIGHT // 2))
-        elif game_clear:
-            clear_text = font.render("GAME CLEAR! - Press R to Restart", True, YELLOW)
-            screen.blit(clear_text, (100, SCREEN_HEIGHT // 2))
+
+class SimulationThread(threading.Thread):
+    """
+    シミュレーションを別スレッドで回し、描画用スナップショットを公開するスレッド
+    入力（押下中のキー・KEYDOWN）はメインスレッドから受け取る
+    """
+    def __init__(self, game, server=None):
+        super().__init__(name="simulation", daemon=True)
+        self.game = game
+        self.server = server              # 外部制御サーバ（無ければNone）
+        self.buffer = SnapshotBuffer()
+        self.keys = None                  # 最新の押下中キー（メインスレッドが書き込む）
+        self.key_events = queue.SimpleQueue()  # KEYDOWNされたキー
+        self.stop_event = threading.Event()
+        self.error = None                 # シミュレーション中に起きた例外
+        self.buffer.publish(game.snapshot())
+
+    def run(self):
+        clock = pg.time.Clock()
+        try:
+            while not self.stop_event.is_set():
+                while not self.key_events.empty():
+                    self.game.handle_key(self.key_events.get())
+                self.game.update(self.keys)
+                if self.server is not None:
+                    self.server.publish(self.game)
+                self.buffer.publish(self.game.snapshot())
+                clock.tick(FPS)
+        except Exception as e:
+            self.error = e
+
+    def stop(self):
+        """ スレッドを止めて終了を待つ """
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=1.0)
+
+
+# --- 外部制御・観戦用のプロトコル ---
+# 1メッセージ = ヘッダ（種類 uint8, 長さ uint32）+ 本体
+MSG_HEADER = struct.Struct("<BI")
+MSG_INPUT = 0x01   # クライアント → サーバ：ラケットの操作（int8：-1=左, 0=停止, 1=右）
+MSG_STATE = 0x10   # サーバ → クライアント：ゲームの状態
+# 状態の本体：フレーム, スコア, 残機, フラグ(bit0=ゲームオーバー, bit1=クリア),
+#             ラケットx, y, 幅, ボール数, 列数, 段数, 最上段のY座標
+#             の後にボールが並び、最後に盤面の耐久度（段数×列数の uint8、0は空き）が続く
+STATE_HEADER = struct.Struct("<IiBBiiiHHIi")
+STATE_BALL = struct.Struct("<iiB")   # 中心x, 中心y, 半径
+STATE_MAX_COLS = 0xFFFF   # 状態で送れる列数の上限（列数はuint16）
+CONTROL_MAX_MESSAGE = 16  # クライアントから受け付けるメッセージ本体の最大長（バイト）
+
+
+def encode_state(game) -> bytes:
+    """ ゲームの状態を配信用のバイト列にする """
+    flags = (1 if game.game_over else 0) | (2 if game.game_clear else 0)
+    balls = game.balls
+    top_y, n_rows, grid = game.blocks.hp_grid()
+    parts = [STATE_HEADER.pack(
+        game.frame, game.score, game.life, flags,
+        game.paddle.rect.x, game.paddle.rect.y, game.paddle.rect.width,
+        len(balls), game.blocks.cols, n_rows, top_y,
+    )]
+    for ball in balls:
+        parts.append(STATE_BALL.pack(ball.rect.centerx, ball.rect.centery, ball.rect.width // 2))
+    parts.append(grid)
+    body = b"".join(parts)
+    return MSG_HEADER.pack(MSG_STATE, len(body)) + body
+
+
+def decode_state(body: bytes) -> dict:
+    """ encode_state() の本体部分を辞書に戻す（クライアント用） """
+    (frame, score, life, flags, paddle_x, paddle_y, paddle_w,
+     n_balls, cols, n_rows, top_y) = STATE_HEADER.unpack_from(body, 0)
+    offset = STATE_HEADER.size
+    balls = []
+    for _ in range(n_balls):
+        balls.append(STATE_BALL.unpack_from(body, offset))
+        offset += STATE_BALL.size
+    grid = body[offset:offset + cols * n_rows]
+    # 耐久度の並びからブロックの (左上x, 左上y, 耐久度) を組み立てる
+    blocks = []
+    for i, hp in enumerate(grid):
+        if hp:
+            row, col = divmod(i, cols)
+            blocks.append((col * (BLOCK_WIDTH + 8) + 20, top_y + row * (BLOCK_HEIGHT + 5), hp))
+    return {
+        "frame": frame, "score": score, "life": life,
+        "game_over": bool(flags & 1), "game_clear": bool(flags & 2),
+        "paddle": (paddle_x, paddle_y, paddle_w),
+        "balls": balls, "blocks": blocks,
+        "cols": cols, "top_y": top_y, "grid": grid,
+    }
+
+
+class RemoteKeys:
+    """ 外部ボットからの操作を pg.key.get_pressed() と同じ形で扱うためのクラス """
+    def __init__(self, keys, direction):
+        self.keys = keys
+        self.direction = direction
+
+    def __getitem__(self, key):
+        if key == pg.K_a and self.direction < 0:
+            return True
+        if key == pg.K_d and self.direction > 0:
+            return True
+        return bool(self.keys[key]) if self.keys is not None else False
 
 
+class ControlServer:
+    """
+    Unixソケットで外部ボットの操作を受け付け、観戦用にゲームの状態を配信するサーバ
+    asyncioのループは別スレッドで動かし、ゲームのループは待たされない
+    状態はティックごとに1回だけエンコードし、全クライアントで同じバイト列を共有する
+    """
+    def __init__(self, path, rate=CONTROL_RATE):
+        self.path = path
+        self.interval = max(1, round(FPS / rate))  # 何フレームに1回配信するか
+        self.direction = 0      # 最新のラケット操作（-1, 0, 1）
+        self.controller = None  # 最後に操作を送ってきたクライアント
+        self.clients = {}       # StreamWriter -> StreamReader
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+        self.socket_inode = None  # このサーバが作ったソケットファイルのinode
+
+    def start(self):
+        """ サーバのスレッドを起動し、待ち受けを始めるまで待つ """
+        self.thread = threading.Thread(target=self._run, name="control-server", daemon=True)
+        self.thread.start()
+        self.ready.wait(timeout=5.0)
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self._remove_stale_socket()
+            self.server = self.loop.run_until_complete(
+                asyncio.start_unix_server(self._handle_client, path=self.path))
+            self.socket_inode = os.lstat(self.path).st_ino
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            self.loop.close()
+            return
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self._close())
+            self.loop.close()
+
+    def _remove_stale_socket(self):
+        """
+        前回のソケットファイルが残っていれば消す
+        ソケット以外のファイルや、まだ他のプロセスが待ち受けているソケットなら起動しない
+        """
+        try:
+            st = os.lstat(self.path)
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(st.st_mode):
+            raise FileExistsError(f"ソケットではないファイルが既にあります: {self.path}")
+        # 接続できるなら使用中。接続を拒否されたときだけ残りかすとみなして消す
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            probe.settimeout(1.0)
+            try:
+                probe.connect(self.path)
+            except ConnectionRefusedError:
+                os.unlink(self.path)
+                return
+        raise FileExistsError(f"ソケットは他のプロセスが使用中です: {self.path}")
+
+    async def _handle_client(self, reader, writer):
+        self.clients[writer] = reader
+        try:
+            while True:
+                kind, length = MSG_HEADER.unpack(await reader.readexactly(MSG_HEADER.size))
+                if length > CONTROL_MAX_MESSAGE:
+                    break  # 不正な長さのメッセージを送ってきたクライアントは切断する
+                payload = await reader.readexactly(length)
+                if kind == MSG_INPUT and length == 1:
+                    self.controller = writer
+                    self.direction = max(-1, min(1, struct.unpack("b", payload)[0]))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.pop(writer, None)
+            if self.controller is writer:
+                self.controller = None
+                self.direction = 0
+            writer.close()
+
+    async def _close(self):
+        self.server.close()
+        # 接続中のクライアントの受信を終わらせ、処理が抜けるのを待つ
+        for reader in self.clients.values():
+            reader.feed_eof()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def publish(self, game):
+        """ ゲームのループから呼ぶ。配信する頻度のフレームだけエンコードしてサーバに渡す """
+        if not self.clients or game.frame % self.interval:
+            return
+        self.loop.call_soon_threadsafe(self._broadcast, encode_state(game))
+
+    def _broadcast(self, data):
+        for writer in list(self.clients):
+            # 送信が詰まっているクライアントにはこのスナップショットを送らない（背圧）
+            if writer.transport.get_write_buffer_size() > CONTROL_BUFFER_LIMIT:
+                continue
+            writer.write(data)
+
+    def stop(self):
+        """ サーバを止めてスレッドの終了を待つ """
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        # このサーバが作ったソケットのときだけ消す
+        if self.socket_inode is None:
+            return
+        try:
+            st = os.lstat(self.path)
+        except FileNotFoundError:
+            return
+        if stat.S_ISSOCK(st.st_mode) and st.st_ino == self.socket_inode:
+            os.unlink(self.path)
+        self.socket_inode = None
+
+
+class Display:
+    """
+    固定の内部解像度のサーフェスに描画し、1フレームに1回だけウィンドウの大きさへ拡大縮小するクラス
+    ゲーム内の座標は論理座標（SCREEN_WIDTH x SCREEN_HEIGHT）のままで、ウィンドウの大きさには依存しない
+    """
+    def __init__(self, window_size=(SCREEN_WIDTH, SCREEN_HEIGHT), render_scale=RENDER_SCALE,
+                 scale_mode="nearest", fullscreen=False):
+        self.render_scale = render_scale
+        self.scale_mode = scale_mode
+        flags = pg.FULLSCREEN if fullscreen else 0
+        self.window = pg.display.set_mode(window_size, flags)
+        internal_size = (int(SCREEN_WIDTH * render_scale), int(SCREEN_HEIGHT * render_scale))
+
+        if self.window.get_size() == internal_size:
+            # ウィンドウと内部解像度が同じなら直接描画する（拡大縮小なし）
+            self.surface = self.window
+            self.target = None
+        else:
+            self.surface = pg.Surface(internal_size).convert()
+            self.window.fill(BLACK)  # 余白（レターボックス）は最初に一度だけ塗る
+            self.target = self.window.subsurface(self._fit_rect(internal_size))
+
+    def _fit_rect(self, internal_size):
+        """ 縦横比を保ったまま、ウィンドウの中央に収まる拡大先の範囲を返す """
+        iw, ih = internal_size
+        ww, wh = self.window.get_size()
+        if self.scale_mode == "nearest" and ww >= iw and wh >= ih:
+            # 整数倍で拡大する（ドットがにじまない）
+            factor = min(ww // iw, wh // ih)
+            w, h = iw * factor, ih * factor
+        else:
+            factor = min(ww / iw, wh / ih)
+            w, h = max(1, int(iw * factor)), max(1, int(ih * factor))
+        return pg.Rect((ww - w) // 2, (wh - h) // 2, w, h)
+
+    def present(self):
+        """ 内部解像度のサーフェスをウィンドウに拡大縮小して表示する """
+        if self.target is not None:
+            if self.scale_mode == "smooth":
+                pg.transform.smoothscale(self.surface, self.target.get_size(), self.target)
+            else:
+                pg.transform.scale(self.surface, self.target.get_size(), self.target)
         pg.display.update()
+        startup_profiler.frame_presented()
+
+
+def draw_snapshot(screen, snapshot):
+    """ スナップショットの内容を画面に描画する（ゲームの状態には触らない） """
+    scale = screen.get_width() / SCREEN_WIDTH  # 論理座標 → 内部解像度の倍率
+    font = get_font(max(1, int(50 * scale)))
+    width, height = screen.get_size()
+    screen.fill(BLACK) 
+    
+    # ゲームオーバーラインを描画（点線で表示）
+    dash_length = max(1, int(15 * scale))  # 点線の長さ
+    gap_length = max(1, int(10 * scale))   # 点線の間隔
+    line_y = snapshot.line_y
+    for x in range(0, width, dash_length + gap_length):
+        pg.draw.line(screen, RED, (x, line_y), (x + dash_length, line_y), max(1, int(2 * scale)))
+
+    for kind, color, geometry, size in snapshot.commands:
+        if kind == "rect":
+            pg.draw.rect(screen, color, geometry, size)
+        elif kind == "circle":
+            pg.draw.circle(screen, color, geometry, size)
+        elif kind == "particle":
+            particle_surface = pg.Surface((size * 2, size * 2), pg.SRCALPHA)
+            pg.draw.circle(particle_surface, color, (size, size), size)
+            screen.blit(particle_surface, (geometry[0] - size, geometry[1] - size))
+        elif kind == "image":
+            screen.blit(color, geometry)
+
+    # ... (スコア表示、ゲームオーバー / クリア表示 はそのまま) ...
+    margin = int(10 * scale)
+    score_text = font.render(f"SCORE: {snapshot.score}", True, WHITE)
+    screen.blit(score_text, (margin, margin))
+    life_text = font.render(f"LIFE: {snapshot.life}", True, WHITE)
+    screen.blit(life_text, (width - life_text.get_width() - margin, margin))
+
+    if snapshot.game_over:
+        over_text = font.render("GAME OVER - Press R to Restart", True, RED)
+        screen.blit(over_text, (int(100 * scale), height // 2))
+    elif snapshot.game_clear:
+        clear_text = font.render("GAME CLEAR! - Press R to Restart", True, YELLOW)
+        screen.blit(clear_text, (int(100 * scale), height // 2))
+
+
+def run_single_threaded(game, display, clock, server=None):
+    """
+    シミュレーションと描画を同じループで交互に行う（通常モード）
+    戻り値: リスタートが要求されたらTrue
+    """
+    while True:
+        # --- イベント処理 ---
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                return False
+            if event.type == pg.KEYDOWN:
+                if event.key == pg.K_r and (game.game_over or game.game_clear):
+                    return True # ゲームリスタート
+                game.handle_key(event.key)
+
+        keys = pg.key.get_pressed()
+        if server is not None:
+            keys = RemoteKeys(keys, server.direction)
+        game.update(keys)
+        if server is not None:
+            server.publish(game)
+        draw_snapshot(display.surface, game.snapshot())
+        display.present()
         clock.tick(FPS)
 
+
+def run_threaded(game, display, clock, server=None):
+    """
+    シミュレーションを別スレッドで回し、メインスレッドは最新のスナップショットを描画する
+    （ウィンドウとイベントはメインスレッドでしか扱えないため、描画はメインスレッド側）
+    戻り値: リスタートが要求されたらTrue
+    """
+    sim = SimulationThread(game, server)
+    try:
+        sim.start()
+    except RuntimeError:
+        # スレッドを作れない環境では通常モードで動かす
+        return run_single_threaded(game, display, clock, server)
+    try:
+        while True:
+            snapshot = sim.buffer.latest()
+            for event in pg.event.get():
+                if event.type == pg.QUIT:
+                    return False
+                if event.type == pg.KEYDOWN:
+                    if event.key == pg.K_r and (snapshot.game_over or snapshot.game_clear):
+                        return True # ゲームリスタート
+                    sim.key_events.put(event.key)
+            keys = pg.key.get_pressed()
+            if server is not None:
+                keys = RemoteKeys(keys, server.direction)
+            sim.keys = keys
+
+            if sim.error is not None:
+                raise sim.error
+
+            draw_snapshot(display.surface, snapshot)
+            display.present()
+            clock.tick(FPS)
+    finally:
+        sim.stop()
+
+
+def make_row_stream(cols, seed=None, level_pack=None):
+    """
+    エンドレスモードの行の供給元を作る（レベルパックが無ければランダム）
+    引数 level_pack: load_level_pack() で読み込んだ段のリスト
+    """
+    if level_pack:
+        return level_pack_stream(level_pack)
+    return random_row_stream(cols, seed)
+
+
+def soak_test(frames, cols=BOARD_COLS, rows=BOARD_ROWS, seed=None, level_pack=None,
+              report_every=SOAK_REPORT_FRAMES):
+    """
+    エンドレスモードを画面なしで長時間動かし、リストやメモリが増え続けないことを確かめる
+    ラケットは常に一番下のボールの真下に置く（自動操作）。ゲームオーバーになっても
+    同じ行の供給元のまま新しいゲームで続ける
+    メモリはSOAK_WARMUP_FRAMESの時点を基準に、その後report_everyごとに記録し、
+    基準からの増加がSOAK_MEMORY_SLACKを超えるか、後半の記録がすべて前半の記録より
+    SOAK_TREND_SLACK以上多い（増え続けている）なら失敗とする
+    戻り値: 問題がなければ0、上限を超えたものがあれば1（終了コードとして使う）
+    例外: framesが短すぎて測れないときはValueError
+    """
+    min_frames = SOAK_WARMUP_FRAMES + report_every * SOAK_MIN_SAMPLES
+    if frames < min_frames:
+        raise ValueError(f"フレーム数が少なすぎます（{min_frames}フレーム以上にしてください）")
+    set_board_size(cols, rows)
+    random.seed(seed)
+    stream = make_row_stream(cols, seed, level_pack)
+    game = Game(cols, rows, {}, row_stream=stream)
+
+    # 各リストの上限（盤面に積めるブロックの段数から求める）
+    stack_rows = (GAME_OVER_LINE - 30) // (BLOCK_HEIGHT + 5) + 1
+    limits = {
+        "balls": MAX_BALLS,
+        "items": MAX_ITEMS,
+        "item3": MAX_ITEM3,
+        "particles": MAX_PARTICLES,
+        "blocks": cols * stack_rows,
+        "cells": cols * stack_rows,  # 1ブロックは1セルにだけ入る
+        "images": int((ZOOM_MAX - ZOOM_MIN) / ZOOM_STEP) + 1,  # ズーム段階ごとに1枚
+    }
+    peaks = dict.fromkeys(limits, 0)
+    restarts = 0
+
+    tracemalloc.start()
+    baseline = None
+    samples = []  # ウォームアップ後のメモリの記録
+    window_start = time.perf_counter()
+    for frame in range(1, frames + 1):
+        if game.game_over:
+            game = Game(cols, rows, {}, row_stream=stream)
+            restarts += 1
+        if game.balls:
+            lowest = max(game.balls, key=lambda ball: ball.rect.bottom)
+            game.paddle.rect.centerx = lowest.rect.centerx
+        game.update(None)
+        game.snapshot()
+
+        sizes = {
+            "balls": len(game.balls),
+            "items": len(game.items),
+            "item3": len(game.item3_list),
+            "particles": len(game.particles),
+            "blocks": len(game.blocks),
+            "cells": len(game.blocks.cells),
+            "images": len(_image_cache),
+        }
+        for name, size in sizes.items():
+            peaks[name] = max(peaks[name], size)
+
+        if frame == SOAK_WARMUP_FRAMES:
+            baseline = tracemalloc.get_traced_memory()[0]
+        if frame % report_every == 0:
+            now = time.perf_counter()
+            memory = tracemalloc.get_traced_memory()[0]
+            if frame > SOAK_WARMUP_FRAMES:
+                samples.append(memory)
+            frame_ms = (now - window_start) * 1000 / (frame % report_every or report_every)
+            print(f"frame={frame} {frame_ms:.3f}ms/frame memory={memory // 1024}KiB "
+                  f"score={game.score} restarts={restarts} "
+                  + " ".join(f"{name}={size}" for name, size in sizes.items()))
+            window_start = now
+    tracemalloc.stop()
+
+    failed = [name for name, peak in peaks.items() if peak > limits[name]]
+    for name in limits:
+        status = "NG" if name in failed else "OK"
+        print(f"{status} {name}: peak={peaks[name]} limit={limits[name]}")
+    growth = max(samples) - baseline
+    if growth > SOAK_MEMORY_SLACK:
+        failed.append("memory")
+    print(f"{'NG' if 'memory' in failed else 'OK'} memory: max growth={growth // 1024}KiB "
+          f"limit={SOAK_MEMORY_SLACK // 1024}KiB")
+    # 後半の一番少ない記録が前半の一番多い記録を上回ったままなら、増え続けているとみなす
+    half = len(samples) // 2
+    trend = min(samples[half:]) - max(samples[:half])
+    if trend > SOAK_TREND_SLACK:
+        failed.append("memory trend")
+    print(f"{'NG' if 'memory trend' in failed else 'OK'} memory trend: rise={trend // 1024}KiB "
+          f"limit={SOAK_TREND_SLACK // 1024}KiB samples="
+          + ",".join(str(sample // 1024) for sample in samples) + f"KiB baseline={baseline // 1024}KiB")
+    return 1 if failed else 0
+
+
+def main(cols=BOARD_COLS, rows=BOARD_ROWS, threaded=False,
+         window_size=(SCREEN_WIDTH, SCREEN_HEIGHT), render_scale=RENDER_SCALE,
+         scale_mode="nearest", fullscreen=False, control_socket=None,
+         control_rate=CONTROL_RATE, startup_profile=False, endless=False,
+         seed=None, level_pack=None):
+    """ メインのゲームループ """
+    startup_profiler.enabled = startup_profile
+    startup_profiler.mark("import")
+    set_board_size(cols, rows)
+
+    # Pygameの初期化（必要なサブシステムだけ。フォントは初めて描画するときに初期化する）
+    pg.display.init()
+    startup_profiler.mark("display init")
+    display = Display(window_size, render_scale, scale_mode, fullscreen)
+    pg.display.set_caption("ウォールブレイカー")
+    clock = pg.time.Clock()
+    # 最初のtickでSDLのタイマーが初期化される。音声スレッドのmixerの初期化と
+    # 同時にならないよう、スレッドを起動する前にメインスレッドで済ませておく
+    clock.tick()
+    startup_profiler.mark("window")
+    
+    # 効果音のロード（バックグラウンドで行う）
+    sounds = {}
+    audio_stop = threading.Event()
+    audio_thread = load_sounds_in_background(sounds, audio_stop)
+    startup_profiler.mark("audio start")
+
+    # 外部制御・観戦用サーバ
+    server = None
+    if control_socket:
+        server = ControlServer(control_socket, control_rate)
+        try:
+            server.start()
+        except (OSError, AttributeError) as e:  # AttributeError: Unixソケット非対応のOS
+            print(f"制御サーバを起動できませんでした: {e}")
+            server = None
+        startup_profiler.mark("control server")
+
+    def new_game():
+        row_stream = make_row_stream(cols, seed, level_pack) if endless else None
+        return Game(cols, rows, sounds, render_scale, row_stream)
+
+    run = run_threaded if threaded else run_single_threaded
+    game = new_game()
+    startup_profiler.mark("game setup")
+    try:
+        while run(game, display, clock, server):
+            game = new_game() # リスタートされたら新しいゲームを始める
+    finally:
+        if server is not None:
+            server.stop()
+        # 音声のロード中にSDLを終了させないよう、スレッドの終了を待つ
+        audio_stop.set()
+        audio_thread.join(timeout=AUDIO_SHUTDOWN_TIMEOUT)
+
+    if audio_thread.is_alive():
+        # まだmixerの初期化中なら、SDLの終了は行わずにプロセスの終了に任せる
+        print("音声の初期化が終わらないため、pygameを終了せずに終了します")
+    else:
+        pg.quit()
+    sys.exit()
+
+def positive_int_arg(text):
+    """ --cols / --rows の値を検査する（1以上の整数） """
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"整数で指定してください: {text}")
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"1以上にしてください: {text}")
+    return value
+
+def cols_arg(text):
+    """ --cols の値を検査する（1以上で、配信する状態に入る列数まで） """
+    cols = positive_int_arg(text)
+    if cols > STATE_MAX_COLS:
+        raise argparse.ArgumentTypeError(f"{STATE_MAX_COLS}以下にしてください: {text}")
+    return cols
+
+def control_rate_arg(text):
+    """ --control-rate の値を検査する（配信はフレームごとに最大1回なのでFPSまで） """
+    try:
+        rate = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"数値で指定してください: {text}")
+    if not 0 < rate <= FPS:
+        raise argparse.ArgumentTypeError(f"0より大きく{FPS}以下で指定してください: {text}")
+    return rate
+
+def window_size_arg(text):
+    """ --window の値（例：1920x1080）を (幅, 高さ) にする """
+    try:
+        width, height = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"幅x高さの形式で指定してください: {text}")
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"幅と高さは1以上にしてください: {text}")
+    return (width, height)
+
+def render_scale_arg(text):
+    """ --render-scale の値を検査する """
+    try:
+        scale = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"数値で指定してください: {text}")
+    if not RENDER_SCALE_MIN <= scale <= RENDER_SCALE_MAX:
+        raise argparse.ArgumentTypeError(
+            f"{RENDER_SCALE_MIN}〜{RENDER_SCALE_MAX}の範囲で指定してください: {text}")
+    return scale
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="ウォールブレイカー")
+    parser.add_argument("--cols", type=cols_arg, default=BOARD_COLS, help="盤面の列数")
+    parser.add_argument("--rows", type=positive_int_arg, default=BOARD_ROWS, help="盤面の初期行数")
+    parser.add_argument("--threaded", action="store_true",
+                        help="シミュレーションと描画を別スレッドで並行して行う")
+    parser.add_argument("--window", type=window_size_arg, default=(SCREEN_WIDTH, SCREEN_HEIGHT),
+                        help="ウィンドウの大きさ（例：1920x1080）")
+    parser.add_argument("--fullscreen", action="store_true", help="フルスクリーンで表示する")
+    parser.add_argument("--render-scale", type=render_scale_arg, default=RENDER_SCALE,
+                        help="内部解像度の倍率（0.5で半分の解像度で描画）")
+    parser.add_argument("--scale-mode", choices=SCALE_MODES, default="nearest",
+                        help="内部解像度からウィンドウへの拡大縮小方法")
+    parser.add_argument("--control-socket", metavar="PATH",
+                        help="外部制御・観戦用のUnixソケットのパス")
+    parser.add_argument("--control-rate", type=control_rate_arg, default=CONTROL_RATE,
+                        help="状態を配信する頻度（回/秒）")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="起動の各段階にかかった時間を表示する")
+    parser.add_argument("--endless", action="store_true",
+                        help="エンドレスモード（行が無限に供給され、だんだん難しくなる）")
+    parser.add_argument("--seed", type=int, help="エンドレスモードの乱数のシード")
+    parser.add_argument("--level-pack", metavar="PATH",
+                        help="エンドレスモードで使うレベルパック（1行=1段、各文字は0〜3の耐久度、0=空き）")
+    parser.add_argument("--soak", type=int, metavar="FRAMES",
+                        help="画面なしでエンドレスモードをFRAMESフレーム動かし、リストやメモリが増え続けないか確かめる")
+    args = parser.parse_args()
+    if args.level_pack:
+        # 起動前にレベルパックを読み込んで検査する
+        try:
+            args.level_pack = load_level_pack(args.level_pack, args.cols)
+        except (OSError, ValueError) as e:
+            parser.error(f"レベルパックを読み込めません: {e}")
+    if args.soak is not None:
+        try:
+            sys.exit(soak_test(args.soak, args.cols, args.rows, args.seed, args.level_pack))
+        except ValueError as e:
+            parser.error(f"--soak: {e}")
+    window_size = args.window
+    if args.fullscreen and args.window == parser.get_default("window"):
+        window_size = (0, 0)  # フルスクリーン時はデスクトップの解像度を使う
+    main(args.cols, args.rows, args.threaded, window_size, args.render_scale,
+         args.scale_mode, args.fullscreen, args.control_socket, args.control_rate,
+         args.startup_profile, args.endless or bool(args.level_pack), args.seed, args.level_pack)